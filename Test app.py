@@ -1,11 +1,13 @@
 
 import unittest
 import sys
+import base64
 sys.path.insert(0, '.')
 
 from app import (
     ConversationEngine, DietaryMatcher, WaitlistManager,
-    Restaurant, Reservation, RESTAURANTS, MENU_DATA, app
+    Restaurant, Reservation, RESTAURANTS, MENU_DATA, CONF_INDEX, app,
+    _classify_memo, _greeting_payload, _menu_payload
 )
 
 
@@ -26,6 +28,21 @@ class TestConversationEngine(unittest.TestCase):
         self.assertEqual(self.engine.detect_intent("join the waitlist"), "waitlist")
         self.assertEqual(self.engine.detect_intent("how long is the wait"), "waitlist")
 
+    def test_long_messages_not_memoized(self):
+        before = _classify_memo.cache_info().currsize
+        self.assertEqual(self.engine.detect_intent("book a table " + "x" * 10000), "book")
+        DietaryMatcher.detect("vegan " + "y" * 10000)
+        self.assertEqual(_classify_memo.cache_info().currsize, before)
+
+    def test_long_text_not_memoized_by_extractors(self):
+        text = "table for 4 at 7pm under Ana " + "z" * 10000
+        before = [f.cache_info().currsize for f in (self.engine._party_size, self.engine._time, self.engine._name)]
+        self.assertEqual(self.engine.extract_party_size(text), 4)
+        self.assertEqual(self.engine.extract_time(text), "7:00 PM")
+        self.engine.extract_name(text)
+        after = [f.cache_info().currsize for f in (self.engine._party_size, self.engine._time, self.engine._name)]
+        self.assertEqual(after, before)
+
     def test_detect_intent_dietary(self):
         self.assertEqual(self.engine.detect_intent("I'm vegan"), "dietary")
         self.assertEqual(self.engine.detect_intent("gluten free options"), "dietary")
@@ -40,6 +57,10 @@ class TestConversationEngine(unittest.TestCase):
         self.assertEqual(self.engine.extract_party_size("two of us"), 2)
         self.assertEqual(self.engine.extract_party_size("four people"), 4)
 
+    def test_extract_party_size_whole_words_only(self):
+        self.assertIsNone(self.engine.extract_party_size("fourteen"))
+        self.assertEqual(self.engine.extract_party_size("someone and three friends"), 3)
+
     def test_extract_time(self):
         tests = [("7pm", "7:00 PM"), ("7:30 PM", "7:30 PM"), ("8 pm", "8:00 PM")]
         for text, expected in tests:
@@ -56,6 +77,10 @@ class TestConversationEngine(unittest.TestCase):
             result = self.engine.extract_name(text)
             self.assertIn(expected, result, f"'{text}' → '{result}', expected '{expected}'")
 
+    def test_extract_name_keeps_embedded_keywords(self):
+        self.assertEqual(self.engine.extract_name("I'm Sam Sunderland"), "Sam Sunderland")
+        self.assertEqual(self.engine.extract_name("call me Itsuki"), "Itsuki")
+
 
 class TestDietaryMatcher(unittest.TestCase):
     def test_detect_vegan(self):
@@ -86,6 +111,12 @@ class TestDietaryMatcher(unittest.TestCase):
         result = DietaryMatcher.filter_menu(menu, [])
         self.assertEqual(len(result), len(menu))
 
+    def test_menu_for_matches_filter_menu(self):
+        menu = MENU_DATA["Sakura Garden"]
+        for restrictions in (["vegan"], ["gluten_free", "dairy_free"], ["vegan", "unknown"]):
+            self.assertEqual(DietaryMatcher.menu_for("Sakura Garden", restrictions),
+                             DietaryMatcher.filter_menu(menu, restrictions))
+
 
 class TestWaitlistManager(unittest.TestCase):
     def setUp(self):
@@ -112,6 +143,15 @@ class TestWaitlistManager(unittest.TestCase):
         next_entry = self.wl.get_next()
         self.assertEqual(next_entry["party_size"], 2)
 
+    def test_large_parties_overtaken_boundedly(self):
+        """An 8-top waits behind no more newer pairs than a 5-top would."""
+        self.wl.add("Eight", 8)
+        for i in range(60):
+            self.wl.add(f"Pair {i}", 2)
+        order = [e["name"] for e in self.wl.get_all()]
+        self.assertEqual(order.index("Eight"), 29)  # was 59 before grouping
+        self.assertEqual([self.wl.get_next()["name"] for _ in range(30)][-1], "Eight")
+
     def test_get_all_returns_list(self):
         self.wl.add("A", 2)
         self.wl.add("B", 3)
@@ -137,12 +177,36 @@ class TestTableOptimization(unittest.TestCase):
         candidates = self.rest.get_available_tables(5, "Tonight", "7:00 PM")
         # Should only return 6-person tables
         for waste, tid, table in candidates:
-            self.assertGreaterEqual(table["size"], 5)
+            self.assertGreaterEqual(table.size, 5)
 
     def test_no_tables_for_oversized_party(self):
         candidates = self.rest.get_available_tables(10, "Tonight", "7:00 PM")
         self.assertEqual(len(candidates), 0)
 
+    def test_no_tables_for_empty_restaurant(self):
+        rest = Restaurant("Empty", "None", {}, "Closed")
+        self.assertEqual(rest.get_available_tables(2, "Tonight", "7:00 PM"), [])
+
+    def test_reserved_table_leaves_and_rejoins_index(self):
+        first = self.rest.get_available_tables(2, "Tonight", "7:00 PM")[0][1]
+        self.rest.mark_reserved(first, "TMTEST")
+        tids = [tid for _, tid, _ in self.rest.get_available_tables(2, "Tonight", "7:00 PM")]
+        self.assertNotIn(first, tids)
+        self.rest.mark_available(first)
+        self.assertEqual(self.rest.get_available_tables(2, "Tonight", "7:00 PM")[0][1], first)
+
+    def test_to_dict_tracks_occupancy(self):
+        self.rest.mark_reserved("T1", "TMAAAAA")
+        self.rest.mark_reserved("T1", "TMAAAAA")  # repeat must not double count
+        self.rest.mark_reserved("T5", "TMBBBBB")
+        d = self.rest.to_dict()
+        self.assertEqual(d["total_tables"], 10)
+        self.assertEqual(d["available_tables"], 8)
+        self.assertEqual(d["occupancy_pct"], 20)
+        self.assertEqual(self.rest.reserved_count, 2)
+        self.rest.mark_available("T5")
+        self.assertEqual(self.rest.reserved_count, 1)
+
 
 class TestReservation(unittest.TestCase):
     def test_creates_with_conf_num(self):
@@ -150,6 +214,14 @@ class TestReservation(unittest.TestCase):
         self.assertTrue(res.conf_num.startswith("TM"))
         self.assertEqual(len(res.conf_num), 7)  # TM + 5 chars
 
+    def test_conf_nums_not_a_fixed_stride(self):
+        def value(code):
+            return int.from_bytes(base64.b32decode(code[2:] + "AAA"), "big") >> 15
+        codes = [value(Reservation("John", 2, "Tonight", "7:00 PM", "Test Rest", "T1").conf_num)
+                 for _ in range(6)]
+        strides = {(b - a) % (1 << 25) for a, b in zip(codes, codes[1:])}
+        self.assertGreater(len(strides), 1)
+
     def test_to_dict(self):
         res = Reservation("Jane", 4, "Tomorrow", "8:00 PM", "Test Rest", "T2", "Window seat")
         d = res.to_dict()
@@ -230,6 +302,92 @@ class TestFlaskAPI(unittest.TestCase):
         res = self.client.get('/api/waitlist/Maison%20Dor%C3%A9e')
         self.assertEqual(res.status_code, 200)
 
+    def test_session_cookie_carries_only_id(self):
+        first = self.client.post('/api/chat', json={"message": "hello", "restaurant": "Maison Dorée"})
+        cookie = first.headers.get('Set-Cookie', '').split(';')[0]
+        res = self.client.post('/api/chat', json={"message": "book a table", "restaurant": "Maison Dorée"})
+        self.assertIn("name", res.get_json()["message"])
+        self.assertEqual(res.headers.get('Set-Cookie', '').split(';')[0], cookie)
+        self.assertLess(len(cookie), 64)
+
+    def test_session_flood_keeps_returning_guests(self):
+        sessions = app.session_interface
+        sessions.MAX_SESSIONS = 5
+        try:
+            self.client.post('/api/chat', json={"message": "hello", "restaurant": "Maison Dorée"})
+            self.client.post('/api/chat', json={"message": "book a table", "restaurant": "Maison Dorée"})
+            flood = app.test_client(use_cookies=False)
+            for _ in range(20):
+                flood.post('/api/chat', json={"message": "hello", "restaurant": "Maison Dorée"})
+            res = self.client.post('/api/chat', json={"message": "Ana", "restaurant": "Maison Dorée"})
+            self.assertIn("Lovely, **Ana**", res.get_json()["message"])
+        finally:
+            del sessions.MAX_SESSIONS
+
+    def test_idle_session_expires(self):
+        sessions = app.session_interface
+        self.client.post('/api/chat', json={"message": "hello", "restaurant": "Maison Dorée"})
+        self.client.post('/api/chat', json={"message": "book a table", "restaurant": "Maison Dorée"})
+        sessions.IDLE_TIMEOUT = -1
+        try:
+            res = self.client.post('/api/chat', json={"message": "Ana", "restaurant": "Maison Dorée"})
+            self.assertIn("Welcome", res.get_json()["message"])
+        finally:
+            del sessions.IDLE_TIMEOUT
+
+    def test_menu_api_not_modified(self):
+        res = self.client.get('/api/menu/Trattoria%20Roma')
+        etag = res.headers.get('ETag')
+        self.assertTrue(etag)
+        res = self.client.get('/api/menu/Trattoria%20Roma', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+
+    def test_menu_api_unknown_restriction_not_cached(self):
+        before = _menu_payload.cache_info().currsize
+        res = self.client.get('/api/menu/Trattoria%20Roma?dietary=' + 'q' * 500)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), [])
+        self.assertEqual(_menu_payload.cache_info().currsize, before)
+
+    def test_tables_api_etag_changes_with_bookings(self):
+        res = self.client.get('/api/tables/Sakura%20Garden')
+        etag = res.headers.get('ETag')
+        res = self.client.get('/api/tables/Sakura%20Garden', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        RESTAURANTS["Sakura Garden"].mark_reserved("T1", "TMETAG1")
+        try:
+            res = self.client.get('/api/tables/Sakura%20Garden', headers={'If-None-Match': etag})
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.get_json()[0]["status"], "reserved")
+        finally:
+            RESTAURANTS["Sakura Garden"].mark_available("T1")
+
+    def test_unknown_restaurant_reply_not_cached(self):
+        before = _greeting_payload.cache_info().currsize
+        res = self.client.post('/api/chat', json={"message": "hello", "restaurant": "Nowhere " + "n" * 5000})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("Nowhere", res.get_json()["message"])
+        self.assertEqual(_greeting_payload.cache_info().currsize, before)
+
+    def test_confirm_matches_whole_words(self):
+        with self.client.session_transaction() as sess:
+            sess["phase"] = "booking_confirm"
+            sess["booking"] = {"name": "Ana", "party": 2, "date": "Tonight", "time": "7:00 PM"}
+            sess["reservations"] = []
+        res = self.client.post('/api/chat', json={"message": "let me know", "restaurant": "Maison Dorée"})
+        self.assertEqual(res.get_json()["type"], "confirm")
+        rest = RESTAURANTS["Maison Dorée"]
+        before = set(rest.reservations)
+        try:
+            res = self.client.post('/api/chat', json={"message": "Okay!", "restaurant": "Maison Dorée"})
+            self.assertEqual(res.get_json()["type"], "success")
+        finally:
+            for conf in set(rest.reservations) - before:
+                booked = rest.reservations.pop(conf)
+                CONF_INDEX.pop(conf, None)
+                if booked.table_id in rest.tables:
+                    rest.mark_available(booked.table_id)
+
 
 if __name__ == "__main__":
     print("🧪 Running TableMate Test Suite...")
@@ -1,19 +1,189 @@
 
 from flask import Flask, render_template, request, jsonify, session
+from flask.json.provider import DefaultJSONProvider
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
 from datetime import datetime, timedelta
+from time import monotonic
 import json
-import uuid
+import base64
+import hashlib
+import secrets
+import threading
 import heapq
+import bisect
 import re
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
+from dataclasses import dataclass, field
+from enum import StrEnum
+from functools import lru_cache
+import orjson
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Keeps the default provider's sorted keys and fallbacks (datetimes as HTTP
+    dates, Decimal/UUID as strings), so responses only differ in speed.
+    """
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def encode(self, obj):
+        """Response body bytes for obj, formatted the way response() sends it."""
+        option = self.OPTIONS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
+
+
+class MemorySession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.last_seen = monotonic()
+
+
+class MemorySessionInterface(SessionInterface):
+    """Server-side sessions kept in process memory; the cookie only carries an id.
+
+    Like the RESTAURANTS store, state lives as long as the process. Session objects
+    are kept by reference, so a request reads and writes the stored dict without
+    copying it. Sessions idle for IDLE_TIMEOUT expire. Past MAX_SESSIONS, sessions
+    that never came back after their first request are dropped first, so a flood of
+    cookieless requests can't push out guests mid-booking; returning sessions go in
+    least recently used order only after that.
+    """
+    MAX_SESSIONS = 10000
+    IDLE_TIMEOUT = 2 * 60 * 60  # seconds
+
+    def __init__(self):
+        # Both tiers are kept in last-seen order, oldest first
+        self._fresh = OrderedDict()  # sid -> MemorySession seen in one request only
+        self._store = OrderedDict()  # sid -> MemorySession that has come back
+        self._lock = threading.Lock()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            now = monotonic()
+            with self._lock:
+                stored = self._store.pop(sid, None)
+                if stored is None:
+                    stored = self._fresh.pop(sid, None)
+                if stored is not None and now - stored.last_seen <= self.IDLE_TIMEOUT:
+                    self._store[sid] = stored
+                    stored.last_seen = now
+                    stored.new = stored.modified = False
+                    return stored
+        # Unknown ids are never adopted, so a client can't pick its own session id
+        return MemorySession(sid=secrets.token_urlsafe(32), new=True)
+
+    def _evict(self, now):
+        for tier in (self._fresh, self._store):
+            while tier and now - next(iter(tier.values())).last_seen > self.IDLE_TIMEOUT:
+                tier.popitem(last=False)
+        while len(self._fresh) + len(self._store) > self.MAX_SESSIONS:
+            (self._fresh or self._store).popitem(last=False)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified:
+                with self._lock:
+                    self._store.pop(session.sid, None)
+                    self._fresh.pop(session.sid, None)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        now = monotonic()
+        with self._lock:
+            tier = self._fresh if session.new else self._store
+            tier[session.sid] = session
+            tier.move_to_end(session.sid)
+            session.last_seen = now
+            self._evict(now)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure,
+                            samesite=samesite)
+        response.vary.add("Cookie")
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.session_interface = MemorySessionInterface()
 app.secret_key = "tablemate-secret-2024"
 
 # ============================================================
 # DATA MODELS
 # ============================================================
 
+def _make_scorer(sizes, avail_by_size, tables):
+    """Build a table scorer specialized to one restaurant's fixed size tiers.
+
+    Each party size that fits gets its (waste, bucket) walk precomputed, so a call
+    does no size comparisons. Buckets are the live lists of available table ids.
+    """
+    plans = {
+        party: tuple((size - party, avail_by_size[size]) for size in sizes if size >= party)
+        for party in range(1, sizes[-1] + 1)
+    } if sizes else {}  # a restaurant with no tables has nothing to plan
+
+    def score(party_size):
+        plan = plans.get(party_size)
+        if plan is None:
+            plan = tuple((size - party_size, avail_by_size[size]) for size in sizes if size >= party_size)
+        candidates = []
+        for waste, bucket in plan:
+            candidates.extend([(waste, tid, tables[tid]) for tid in bucket])
+        return candidates
+
+    return score
+
+
+@dataclass(slots=True)
+class Table:
+    id: str
+    size: int
+    status: str = "available"
+    reservation: str | None = None  # conf_num while reserved
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "size": self.size,
+            "status": self.status,
+            "reservation": self.reservation
+        }
+
+
 class Restaurant:
     def __init__(self, name, cuisine, capacity, hours):
         self.name = name
@@ -23,58 +193,124 @@ class Restaurant:
         self.tables = self._init_tables()
         self.reservations = {}   # conf_num -> Reservation
         self.waitlist = WaitlistManager()
+        self._lock = threading.Lock()  # guards the availability index across server threads
 
     def _init_tables(self):
-        """Initialize tables from capacity config."""
+        """Initialize tables from capacity config, plus the availability index."""
         tables = {}
         tid = 1
         for size, count in self.capacity.items():
             for _ in range(count):
-                tables[f"T{tid}"] = {
-                    "id": f"T{tid}",
-                    "size": size,
-                    "status": "available",
-                    "reservation": None
-                }
+                tables[f"T{tid}"] = Table(f"T{tid}", size)
                 tid += 1
+        # Available table ids grouped by size, each list kept in creation order
+        self._table_order = {t: i for i, t in enumerate(tables)}
+        self._sorted_sizes = sorted(self.capacity)
+        self._avail_by_size = {size: [] for size in self._sorted_sizes}
+        for t, table in tables.items():
+            self._avail_by_size[table.size].append(t)
+        self._avail_cache = {}  # party_size -> candidates, cleared on any status change
+        self._score = _make_scorer(tuple(self._sorted_sizes), self._avail_by_size, tables)
+        self._total_tables = len(tables)
+        self._available_count = len(tables)
+        self._version = 0  # bumped on every table change; keys the cached API payloads
         return tables
 
+    def _set_status(self, tid, status, reservation):
+        """Single place table status changes, keeping the index and counts in step."""
+        table = self.tables[tid]
+        with self._lock:
+            if table.status != status:
+                if status == "available":
+                    bisect.insort(self._avail_by_size[table.size], tid, key=self._table_order.__getitem__)
+                    self._available_count += 1
+                elif table.status == "available":
+                    self._avail_by_size[table.size].remove(tid)
+                    self._available_count -= 1
+                self._avail_cache.clear()
+            table.status = status
+            table.reservation = reservation
+            self._version += 1
+
+    def mark_reserved(self, tid, conf_num):
+        self._set_status(tid, "reserved", conf_num)
+
+    def mark_available(self, tid):
+        self._set_status(tid, "available", None)
+
+    @property
+    def available_count(self):
+        return self._available_count
+
+    @property
+    def reserved_count(self):
+        return self._total_tables - self._available_count
+
+    @property
+    def version(self):
+        return self._version
+
     def get_available_tables(self, party_size, date, time):
-        """Find optimal table for party using bin-packing heuristic."""
-        candidates = []
-        for tid, table in self.tables.items():
-            if table["status"] == "available" and table["size"] >= party_size:
-                # Score: prefer smallest table that fits (waste minimization)
-                waste = table["size"] - party_size
-                candidates.append((waste, tid, table))
-        candidates.sort(key=lambda x: x[0])  # Sort by waste ascending
+        """Find optimal table for party using bin-packing heuristic.
+
+        The returned list is cached until the next status change; don't mutate it.
+        """
+        if not self._sorted_sizes or party_size > self._sorted_sizes[-1]:
+            return []
+        candidates = self._avail_cache.get(party_size)
+        if candidates is None:
+            with self._lock:
+                # Score: prefer smallest table that fits (waste minimization). Walking the
+                # size tiers upward from the first that fits yields waste-ascending order.
+                candidates = self._avail_cache[party_size] = self._score(party_size)
         return candidates
 
     def to_dict(self):
-        available = sum(1 for t in self.tables.values() if t["status"] == "available")
+        available = self._available_count
         return {
             "name": self.name,
             "cuisine": self.cuisine,
             "hours": self.hours,
-            "total_tables": len(self.tables),
+            "total_tables": self._total_tables,
             "available_tables": available,
-            "occupancy_pct": round((1 - available/len(self.tables)) * 100)
+            "occupancy_pct": round((1 - available/self._total_tables) * 100)
         }
 
 
+# A confirmation code is all it takes to cancel a booking, so codes must be
+# unpredictable. Random bits are drawn from the OS in batches, not per booking.
+_CONF_MASK = (1 << 25) - 1  # 25 bits = 5 base32 characters
+_CONF_BATCH = 256
+_CONF_POOL = []  # unused random 25-bit values; list.pop/extend are atomic
+
+
+def _next_conf_num():
+    while True:
+        try:
+            n = _CONF_POOL.pop()
+        except IndexError:
+            batch = secrets.token_bytes(4 * _CONF_BATCH)
+            _CONF_POOL.extend(int.from_bytes(batch[i:i + 4], "big") & _CONF_MASK
+                              for i in range(0, len(batch), 4))
+            continue
+        conf = "TM" + base64.b32encode((n << 15).to_bytes(5, "big"))[:5].decode()
+        if conf not in CONF_INDEX:  # never hand out a code that's still live
+            return conf
+
+
+@dataclass(slots=True)
 class Reservation:
-    def __init__(self, name, party_size, date, time, restaurant, table_id, special="", dietary=""):
-        self.conf_num = f"TM{str(uuid.uuid4())[:5].upper()}"
-        self.name = name
-        self.party_size = party_size
-        self.date = date
-        self.time = time
-        self.restaurant = restaurant
-        self.table_id = table_id
-        self.special = special
-        self.dietary = dietary
-        self.created_at = datetime.now()
-        self.status = "confirmed"
+    name: str
+    party_size: int
+    date: str
+    time: str
+    restaurant: str
+    table_id: str
+    special: str = ""
+    dietary: str = ""
+    conf_num: str = field(init=False, default_factory=_next_conf_num)
+    created_at: datetime = field(init=False, default_factory=datetime.now)
+    status: str = field(init=False, default="confirmed")
 
     def to_dict(self):
         return {
@@ -92,47 +328,115 @@ class Reservation:
         }
 
 
+_PEAK_CACHE = [0.0, 1.0]  # [monotonic expiry, peak factor]
+
+
+def _peak_factor():
+    """1.3 during peak hours (6-8 PM), else 1.0; re-read from the clock once a minute."""
+    now = monotonic()
+    if now >= _PEAK_CACHE[0]:
+        hour = datetime.now().hour
+        _PEAK_CACHE[:] = [now + 60, 1.3 if 18 <= hour <= 20 else 1.0]
+    return _PEAK_CACHE[1]
+
+
 class WaitlistManager:
-    """Priority queue based waitlist: smaller parties get tables faster."""
+    """Priority queue based waitlist: smaller parties get tables faster.
+
+    Parties up to GROUP_BOUNDARY are queued by size; larger parties share one
+    FIFO group ranked as GROUP_BOUNDARY + 1, so however big they are, the number
+    of newer small parties allowed to overtake them stays bounded.
+    """
+    GROUP_BOUNDARY = 4
+
     def __init__(self):
-        self._queue = []  # min-heap: (wait_priority, timestamp, entry)
+        # Bucket queue: one FIFO per size group holding (wait_priority, counter, entry).
+        # Priority only grows within a bucket, so the next party is always a bucket head.
+        self._buckets = defaultdict(deque)
+        self._size = 0
         self._counter = 0
+        self._sorted_cache = None  # get_all() view, dropped on every mutation
+        self._lock = threading.Lock()
 
     def add(self, name, party_size):
         timestamp = datetime.now()
         # Priority: smaller parties prioritized (get seated faster)
-        priority = party_size * 10 + self._counter
-        entry = {
-            "id": self._counter,
-            "name": name,
-            "party_size": party_size,
-            "joined_at": timestamp.isoformat(),
-            "estimated_wait": self._estimate_wait(party_size)
-        }
-        heapq.heappush(self._queue, (priority, self._counter, entry))
-        self._counter += 1
+        group = min(party_size, self.GROUP_BOUNDARY + 1)
+        with self._lock:
+            priority = group * 10 + self._counter
+            entry = {
+                "id": self._counter,
+                "name": name,
+                "party_size": party_size,
+                "joined_at": timestamp.isoformat(),
+                "estimated_wait": self._estimate_wait(party_size)
+            }
+            self._buckets[group].append((priority, self._counter, entry))
+            self._size += 1
+            self._counter += 1
+            self._sorted_cache = None
         return entry
 
     def _estimate_wait(self, party_size):
-        base = len(self._queue) * 15  # 15 min per party ahead
+        base = self._size * 15  # 15 min per party ahead
         size_factor = 1.5 if party_size > 4 else 1.0
-        # Peak hour detection (6-8 PM)
-        hour = datetime.now().hour
-        peak_factor = 1.3 if 18 <= hour <= 20 else 1.0
-        wait = int(base * size_factor * peak_factor) + 10
+        wait = int(base * size_factor * _peak_factor()) + 10
         return f"~{wait} minutes"
 
     def get_next(self):
-        if self._queue:
-            _, _, entry = heapq.heappop(self._queue)
-            return entry
+        with self._lock:
+            if self._size:
+                # At most GROUP_BOUNDARY + 1 bucket heads to compare
+                group = min(self._buckets, key=lambda g: self._buckets[g][0])
+                bucket = self._buckets[group]
+                _, _, entry = bucket.popleft()
+                if not bucket:
+                    del self._buckets[group]
+                self._size -= 1
+                self._sorted_cache = None
+                return entry
         return None
 
     def get_all(self):
-        return [entry for _, _, entry in sorted(self._queue)]
+        """Entries in seating order; cached until the next add/get_next, don't mutate."""
+        cached = self._sorted_cache
+        if cached is None:
+            with self._lock:
+                cached = self._sorted_cache = [entry for _, _, entry in heapq.merge(*self._buckets.values())]
+        return cached
 
     def size(self):
-        return len(self._queue)
+        return self._size
+
+
+def _compile_keywords(groups):
+    """Compile {label: [keywords]} into one trie-shaped regex for a single-pass scan.
+
+    Returns (pattern, owners). The scan reports only the longest keyword at each
+    position, so owners maps every keyword to the labels (in groups order) of all
+    keywords it starts with.
+    """
+    trie = {}
+    for keywords in groups.values():
+        for kw in keywords:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    owners = {}
+    for keywords in groups.values():
+        for kw in keywords:
+            owners[kw] = tuple(label for label, kws in groups.items()
+                               if any(kw.startswith(k) for k in kws))
+    return re.compile(f"(?=({build(trie)}))"), owners
 
 
 class DietaryMatcher:
@@ -158,29 +462,44 @@ class DietaryMatcher:
     }
 
     @classmethod
-    def detect(cls, text):
-        """Detect dietary requirements from text."""
-        text_lower = text.lower()
-        detected = []
-        for restriction, keywords in cls.KEYWORDS.items():
-            if any(kw in text_lower for kw in keywords):
-                detected.append(restriction)
-        return detected
+    def detect(cls, text, lower=None):
+        """Detect dietary requirements from text (pass lower if already lowercased)."""
+        return list(_classify(text.lower() if lower is None else lower)[1])
+
+    @classmethod
+    def _scan(cls, text_lower):
+        found = set()
+        for match in _DIETARY_RE.finditer(text_lower):
+            found.update(_DIETARY_OWNERS[match.group(1)])
+        return [r for r in cls.KEYWORDS if r in found]
 
     @classmethod
     def filter_menu(cls, menu_items, restrictions):
         """Filter menu items by dietary restrictions."""
         if not restrictions:
             return menu_items
-        matching = []
-        for item in menu_items:
-            item_tags = item.get("tags", [])
-            required_tags = []
-            for r in restrictions:
-                required_tags.extend(cls.TAGS.get(r, []))
-            if any(tag in item_tags for tag in required_tags):
-                matching.append(item)
-        return matching
+        required_tags = frozenset().union(*(_REQUIRED_TAGS.get(r, ()) for r in restrictions))
+        return [item for item in menu_items if not required_tags.isdisjoint(item.get("tags", []))]
+
+    @classmethod
+    def menu_for(cls, restaurant_name, restrictions):
+        """Filtered menu for a restaurant, answered from its dietary index and memoized."""
+        menu = MENU_DATA.get(restaurant_name, [])
+        if not restrictions or restaurant_name not in _DIETARY_INDEX:
+            return menu
+        # Unknown restrictions add no tags, so they don't need their own memo entry
+        key = frozenset(restrictions).intersection(_REQUIRED_TAGS)
+        memo = _MENU_INDEX[restaurant_name]
+        filtered = memo.get(key)
+        if filtered is None:
+            postings = _DIETARY_INDEX[restaurant_name]
+            hits = set().union(*(postings[r] for r in key))
+            filtered = memo[key] = [menu[i] for i in sorted(hits)]
+        return filtered
+
+
+_DIETARY_RE, _DIETARY_OWNERS = _compile_keywords(DietaryMatcher.KEYWORDS)
+_REQUIRED_TAGS = {r: frozenset(tags) for r, tags in DietaryMatcher.TAGS.items()}
 
 
 # ============================================================
@@ -212,6 +531,20 @@ MENU_DATA = {
     ]
 }
 
+
+def _build_dietary_index(menu):
+    """Inverted index over a menu: restriction -> positions of the items satisfying it."""
+    postings = defaultdict(set)
+    for i, item in enumerate(menu):
+        for tag in item.get("tags", []):
+            postings[tag].add(i)
+    return {r: frozenset().union(*(postings.get(tag, ()) for tag in tags))
+            for r, tags in _REQUIRED_TAGS.items()}
+
+
+_DIETARY_INDEX = {name: _build_dietary_index(menu) for name, menu in MENU_DATA.items()}
+_MENU_INDEX = {name: {} for name in MENU_DATA}  # restriction set -> filtered menu
+
 # Initialize restaurants
 RESTAURANTS = {
     "Maison Dorée": Restaurant(
@@ -231,6 +564,9 @@ RESTAURANTS = {
     )
 }
 
+# Confirmation number -> restaurant holding it, so cancelling doesn't scan every restaurant
+CONF_INDEX = {}
+
 POLICIES = {
     "Maison Dorée": "48-hour cancellation required. Smart dress code. Groups 6+ require deposit.",
     "Sakura Garden": "24-hour cancellation. Walk-ins welcome when available.",
@@ -238,12 +574,63 @@ POLICIES = {
 }
 
 TIME_SLOTS = ["6:00 PM", "6:30 PM", "7:00 PM", "7:30 PM", "8:00 PM", "8:30 PM", "9:00 PM", "9:30 PM"]
+WAITLIST_PARTY_CHIPS = ["1", "2", "3", "4", "5", "6"]
+BOOKING_PARTY_CHIPS = ["1", "2", "3", "4", "5", "6", "7", "8"]
+
+# Extraction patterns, compiled once at import instead of per chat turn
+_PARTY_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r"(\d+)\s*(?:people|person|guest|pax|of us)",
+    r"(?:for|party of)\s*(\d+)",
+    r"^(\d+)$",
+    r"table for (\d+)",
+)]
+_WORD_RE = re.compile(r"[a-z]+")
+_WORD_NUMS = {"one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8}
+_TIME_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)", re.IGNORECASE)
+_TIME_SLOT_TOKENS = {slot.lower().replace(" ", ""): slot for slot in TIME_SLOTS}
+# Only chip-sized text is memoized: client messages are unbounded, and caching long
+# ones would let a single client pin arbitrary amounts of memory
+_MEMO_MAX_LEN = 64
+_NAME_REMOVE_RE = re.compile(r"\b(?:my name is|i'm|i am|it's|its|call me|under|name)\b", re.IGNORECASE)
+_CONF_RE = re.compile(r"TM[A-Z0-9]+")
+# Confirmation replies are matched on whole words, so "know" isn't a "no"
+_POSITIVE = frozenset({"yes", "yeah", "yep", "confirm", "confirmed", "book", "great", "perfect", "ok", "okay", "sure"})
+_NEGATIVE = frozenset({"no", "nope", "nah", "not", "cancel", "wrong", "change"})
 
 
 # ============================================================
 # NLP CONVERSATION ENGINE
 # ============================================================
 
+class Phase(StrEnum):
+    """Conversation states, stored in the session between turns."""
+    GREETING = "greeting"
+    IDLE = "idle"
+    WAITLIST_NAME = "waitlist_name"
+    WAITLIST_PARTY = "waitlist_party"
+    BOOKING_NAME = "booking_name"
+    BOOKING_PARTY = "booking_party"
+    BOOKING_DATE = "booking_date"
+    BOOKING_TIME = "booking_time"
+    BOOKING_SPECIAL = "booking_special"
+    BOOKING_CONFIRM = "booking_confirm"
+
+
+class Intent(StrEnum):
+    """detect_intent results; values match the ConversationEngine.INTENTS keys."""
+    BOOK = "book"
+    MENU = "menu"
+    WAITLIST = "waitlist"
+    CANCEL = "cancel"
+    MODIFY = "modify"
+    MY_BOOKINGS = "my_bookings"
+    DIETARY = "dietary"
+    HOURS = "hours"
+    POLICY = "policy"
+    HELLO = "hello"
+    UNKNOWN = "unknown"
+
+
 class ConversationEngine:
     """State machine for multi-turn restaurant booking conversations."""
 
@@ -263,55 +650,97 @@ class ConversationEngine:
     def __init__(self):
         pass
 
-    def detect_intent(self, text):
-        text_lower = text.lower()
-        for intent, keywords in self.INTENTS.items():
-            if any(kw in text_lower for kw in keywords):
-                return intent
-        return "unknown"
-
+    def detect_intent(self, text, lower=None):
+        return _classify(text.lower() if lower is None else lower)[0]
+
+    @staticmethod
+    def _scan_intent(text_lower):
+        # One scan for every keyword; the earliest-listed matching intent wins
+        best = (len(ConversationEngine.INTENTS), Intent.UNKNOWN)
+        for match in _INTENT_RE.finditer(text_lower):
+            hit = _INTENT_HITS[match.group(1)]
+            if hit < best:
+                best = hit
+                if hit[0] == 0:
+                    break
+        return best[1]
+
+    # Extractors are pure functions of the message, so repeats ("2", "7pm") hit a cache
+    # Memoized for chip-sized input only; longer text calls the uncached function
     def extract_party_size(self, text):
-        patterns = [
-            r"(\d+)\s*(?:people|person|guest|pax|of us)",
-            r"(?:for|party of)\s*(\d+)",
-            r"^(\d+)$",
-            r"table for (\d+)",
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        if len(text) > _MEMO_MAX_LEN:
+            return self._party_size.__wrapped__(text)
+        return self._party_size(text)
+
+    def extract_time(self, text):
+        if len(text) > _MEMO_MAX_LEN:
+            return self._time.__wrapped__(text)
+        return self._time(text)
+
+    def extract_name(self, text):
+        if len(text) > _MEMO_MAX_LEN:
+            return self._name.__wrapped__(text)
+        return self._name(text)
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _party_size(text):
+        for pattern in _PARTY_PATTERNS:
+            match = pattern.search(text)
             if match:
                 return int(match.group(1))
-        # Word numbers
-        word_nums = {"one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8}
-        for word, num in word_nums.items():
-            if word in text.lower():
+        # Word numbers, matched as whole words ("fourteen" isn't "four")
+        for word in _WORD_RE.findall(text.lower()):
+            num = _WORD_NUMS.get(word)
+            if num:
                 return num
         return None
 
-    def extract_time(self, text):
-        match = re.search(r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)", text, re.IGNORECASE)
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _time(text):
+        match = _TIME_RE.search(text)
         if match:
             hour = int(match.group(1))
             minute = match.group(2) or "00"
             ampm = match.group(3).upper()
             return f"{hour}:{minute} {ampm}"
         # Check for slot matches
-        text_lower = text.lower()
-        for slot in TIME_SLOTS:
-            if slot.lower().replace(" ", "") in text_lower.replace(" ", ""):
+        compact = text.lower().replace(" ", "")
+        for token, slot in _TIME_SLOT_TOKENS.items():
+            if token in compact:
                 return slot
         return None
 
-    def extract_name(self, text):
-        removals = ["my name is", "i'm", "i am", "it's", "its", "call me", "under", "name"]
-        name = text
-        for r in removals:
-            name = re.sub(r, "", name, flags=re.IGNORECASE)
-        name = name.strip().strip(",.!?")
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _name(text):
+        # Single pass over the text; word boundaries keep names like "Sunderland" intact
+        name = _NAME_REMOVE_RE.sub("", text).strip(" ,.!?")
         # Capitalize properly
         return " ".join(w.capitalize() for w in name.split() if w)
 
 
+_INTENT_RE, _INTENT_OWNERS = _compile_keywords(ConversationEngine.INTENTS)
+_INTENT_RANK = {intent: rank for rank, intent in enumerate(ConversationEngine.INTENTS)}
+# keyword -> (rank, intent) of its best owner, so a scan hit is one lookup and a tuple compare
+_INTENT_HITS = {kw: (_INTENT_RANK[owners[0]], Intent(owners[0])) for kw, owners in _INTENT_OWNERS.items()}
+
+
+def _classify(text_lower):
+    """(intent, dietary) for a lowercased message, shared by both detectors per turn."""
+    if len(text_lower) > _MEMO_MAX_LEN:
+        return _scan_message(text_lower)
+    return _classify_memo(text_lower)
+
+
+def _scan_message(text_lower):
+    return ConversationEngine._scan_intent(text_lower), tuple(DietaryMatcher._scan(text_lower))
+
+
+_classify_memo = lru_cache(maxsize=1024)(_scan_message)
+
+
 engine = ConversationEngine()
 
 
@@ -328,7 +757,7 @@ def index():
 @app.route("/api/chat", methods=["POST"])
 def chat():
     """Main chatbot endpoint - processes messages and returns responses."""
-    data = request.json
+    data = request.get_json(cache=False)  # parsed once by orjson; nothing re-reads it
     user_msg = data.get("message", "").strip()
     restaurant_name = data.get("restaurant", "Maison Dorée")
 
@@ -337,327 +766,403 @@ def chat():
 
     # Get or initialize conversation state
     if "phase" not in session:
-        session["phase"] = "greeting"
+        session["phase"] = Phase.GREETING
         session["booking"] = {}
         session["reservations"] = []
 
-    phase = session.get("phase", "greeting")
+    phase = session.get("phase", Phase.GREETING)
     booking = session.get("booking", {})
     restaurant = RESTAURANTS.get(restaurant_name)
 
-    response = process_message(user_msg, phase, booking, restaurant, restaurant_name)
+    payload, next_phase, new_booking = process_message(user_msg, phase, booking, restaurant, restaurant_name)
+
+    # Save updated state. Handlers only edit the booking in place on a phase
+    # change, so an unchanged phase and booking object means nothing to write.
+    if next_phase != phase or new_booking is not booking:
+        session["phase"] = next_phase
+        session["booking"] = new_booking
+
+    body = payload if isinstance(payload, bytes) else app.json.encode(payload)
+    return app.response_class(body, mimetype="application/json")
 
-    # Save updated state
-    session["phase"] = response.pop("next_phase", phase)
-    session["booking"] = response.pop("booking", booking)
-    session.modified = True
 
-    return jsonify(response)
+@dataclass(slots=True)
+class Turn:
+    """One chat message and the context its handler needs."""
+    text: str
+    text_lower: str
+    booking: dict
+    restaurant: Restaurant
+    restaurant_name: str
+    _words: frozenset | None = None
+
+    @property
+    def words(self):
+        """The message's words, tokenized on first use and shared by all checks."""
+        if self._words is None:
+            self._words = frozenset(_WORD_RE.findall(self.text_lower))
+        return self._words
 
 
 def process_message(text, phase, booking, restaurant, restaurant_name):
-    """Core NLP processing - returns response dict."""
+    """Core NLP processing - returns (response payload, next phase, booking)."""
     text_lower = text.lower()
-    intent = engine.detect_intent(text)
+    intent = engine.detect_intent(text, lower=text_lower)
+    if intent is Intent.CANCEL and "cancel" not in text_lower:
+        intent = Intent.UNKNOWN  # "delete" alone isn't enough to cancel
+    if not isinstance(phase, Phase):
+        try:
+            phase = Phase(phase)
+        except ValueError:
+            phase = Phase.GREETING  # unknown state: restart the conversation
+    return _HANDLERS[phase, intent](Turn(text, text_lower, booking, restaurant, restaurant_name))
+
+
+# Replies that depend only on the restaurant (and detected restrictions) are
+# serialized once; handlers hand chat() the bytes as their payload.
+def _reply_payload(turn, build, *args):
+    """Cached reply for a known restaurant. The name comes from the client, so an
+    unknown one is encoded per request rather than becoming a cache key."""
+    if turn.restaurant is None:
+        return build.__wrapped__(turn.restaurant_name, *args)
+    return build(turn.restaurant_name, *args)
+
+
+# ── Phase: GREETING ──────────────────────────────────────
+def _handle_greeting(turn):
+    return _reply_payload(turn, _greeting_payload), Phase.IDLE, {}
+
+
+@lru_cache(maxsize=64)
+def _greeting_payload(restaurant_name):
+    return app.json.encode({
+        "type": "chips",
+        "message": f"Welcome to **{restaurant_name}** 🍽️\n\nI'm TableMate, your personal dining concierge. What can I help you with?",
+        "chips": ["📅 Book a table", "🍴 View menu", "⏳ Join waitlist", "📋 View my reservations", "🥗 Dietary options"]
+    })
+
+
+# ── MENU ─────────────────────────────────────────────────
+def _handle_menu(turn):
+    dietary = DietaryMatcher.detect(turn.text, lower=turn.text_lower)
+    body = _reply_payload(turn, _menu_reply_payload, tuple(dietary))
+    return body, Phase.IDLE, turn.booking
+
+
+@lru_cache(maxsize=256)
+def _menu_reply_payload(restaurant_name, dietary):
+    menu = DietaryMatcher.menu_for(restaurant_name, dietary)
+    if dietary:
+        label = " & ".join(d.replace("_", "-") for d in dietary)
+        title = f"**{label.title()} options** at {restaurant_name}:"
+    else:
+        title = f"**Menu preview** — {restaurant_name}:"
+    return app.json.encode({
+        "type": "menu",
+        "message": title,
+        "menu": menu
+    })
+
+
+# ── DIETARY ──────────────────────────────────────────────
+def _handle_dietary(turn):
+    dietary = DietaryMatcher.detect(turn.text, lower=turn.text_lower)
+    body = _reply_payload(turn, _dietary_reply_payload, tuple(dietary) or ("vegetarian",))
+    return body, Phase.IDLE, turn.booking
+
+
+@lru_cache(maxsize=256)
+def _dietary_reply_payload(restaurant_name, dietary):
+    menu = DietaryMatcher.menu_for(restaurant_name, dietary)
+    tags_str = ", ".join(d.replace("_"," ").title() for d in dietary)
+    return app.json.encode({
+        "type": "menu",
+        "message": f"Here are **{tags_str}** friendly options at {restaurant_name}. Our chef can also adapt most dishes — just let us know when booking:",
+        "menu": menu,
+        "chips": ["Book a table with dietary notes"]
+    })
+
+
+# ── HOURS / POLICY ───────────────────────────────────────
+def _handle_info(turn):
+    body = _reply_payload(turn, _hours_payload, turn.restaurant.hours)
+    return body, Phase.IDLE, turn.booking
+
+
+@lru_cache(maxsize=64)
+def _hours_payload(restaurant_name, hours):
+    return app.json.encode({
+        "type": "text",
+        "message": f"📋 **{restaurant_name}**\n\n⏰ Hours: {hours}\n\n📜 Policy: {POLICIES.get(restaurant_name, 'Please contact us for details.')}",
+        "chips": ["Book a table", "View menu"]
+    })
+
+
+# ── WAITLIST ─────────────────────────────────────────────
+def _handle_waitlist_start(turn):
+    current_wait = turn.restaurant.waitlist.size()
+    return {
+        "type": "text",
+        "message": f"I'll add you to the waitlist for **{turn.restaurant_name}**.\n\nCurrent queue: **{current_wait} parties** ahead of you.\n\nWhat name should I put you under?"
+    }, Phase.WAITLIST_NAME, turn.booking
 
-    # ── Phase: GREETING ──────────────────────────────────────
-    if phase == "greeting" or intent == "hello":
-        return {
-            "type": "chips",
-            "message": f"Welcome to **{restaurant_name}** 🍽️\n\nI'm TableMate, your personal dining concierge. What can I help you with?",
-            "chips": ["📅 Book a table", "🍴 View menu", "⏳ Join waitlist", "📋 View my reservations", "🥗 Dietary options"],
-            "next_phase": "idle",
-            "booking": {}
-        }
 
-    # ── MENU ─────────────────────────────────────────────────
-    if intent == "menu":
-        dietary = DietaryMatcher.detect(text)
-        menu = MENU_DATA.get(restaurant_name, [])
-        if dietary:
-            menu = DietaryMatcher.filter_menu(menu, dietary)
-            label = " & ".join(d.replace("_", "-") for d in dietary)
-            title = f"**{label.title()} options** at {restaurant_name}:"
-        else:
-            title = f"**Menu preview** — {restaurant_name}:"
-        return {
-            "type": "menu",
-            "message": title,
-            "menu": menu,
-            "next_phase": "idle",
-            "booking": booking
-        }
+def _handle_waitlist_name(turn):
+    booking = turn.booking
+    name = engine.extract_name(turn.text)
+    if not name or len(name) < 2:
+        return {"type": "text", "message": "Could you share your name please?"}, Phase.WAITLIST_NAME, booking
+    booking["name"] = name
+    return {
+        "type": "chips",
+        "message": f"Got it, **{name}**! How many guests?",
+        "chips": WAITLIST_PARTY_CHIPS
+    }, Phase.WAITLIST_PARTY, booking
+
+
+def _handle_waitlist_party(turn):
+    booking, restaurant = turn.booking, turn.restaurant
+    party = engine.extract_party_size(turn.text)
+    if not party:
+        return {"type": "chips", "message": "How many guests?", "chips": WAITLIST_PARTY_CHIPS}, Phase.WAITLIST_PARTY, booking
+    entry = restaurant.waitlist.add(booking["name"], party)
+    position = restaurant.waitlist.size()
+    return {
+        "type": "success",
+        "message": "Added to waitlist!",
+        "details": {
+            "Name": entry["name"],
+            "Party size": party,
+            "Position": f"#{position} in queue",
+            "Est. wait": entry["estimated_wait"]
+        },
+        "sms": f"TableMate: You're #{position} on the waitlist at {restaurant.name}. Est. wait: {entry['estimated_wait']}"
+    }, Phase.IDLE, {}
 
-    # ── DIETARY ──────────────────────────────────────────────
-    if intent == "dietary":
-        dietary = DietaryMatcher.detect(text)
-        if not dietary:
-            dietary = ["vegetarian"]
-        menu = DietaryMatcher.filter_menu(MENU_DATA.get(restaurant_name, []), dietary)
-        tags_str = ", ".join(d.replace("_"," ").title() for d in dietary)
-        return {
-            "type": "menu",
-            "message": f"Here are **{tags_str}** friendly options at {restaurant_name}. Our chef can also adapt most dishes — just let us know when booking:",
-            "menu": menu,
-            "chips": ["Book a table with dietary notes"],
-            "next_phase": "idle",
-            "booking": booking
-        }
 
-    # ── HOURS / POLICY ───────────────────────────────────────
-    if intent == "hours" or intent == "policy":
+# ── MY BOOKINGS ───────────────────────────────────────────
+def _handle_my_bookings(turn):
+    reservations = session.get("reservations", [])
+    if not reservations:
         return {
             "type": "text",
-            "message": f"📋 **{restaurant_name}**\n\n⏰ Hours: {restaurant.hours}\n\n📜 Policy: {POLICIES.get(restaurant_name, 'Please contact us for details.')}",
-            "chips": ["Book a table", "View menu"],
-            "next_phase": "idle",
-            "booking": booking
-        }
+            "message": "You don't have any reservations yet. Would you like to make one?",
+            "chips": ["Book a table for 2", "Book a table for 4"]
+        }, Phase.IDLE, {}
+    return {
+        "type": "reservations",
+        "message": f"Here are your **{len(reservations)}** reservation(s):",
+        "reservations": reservations
+    }, Phase.IDLE, turn.booking
+
 
-    # ── WAITLIST ─────────────────────────────────────────────
-    if intent == "waitlist" and phase == "idle":
-        current_wait = restaurant.waitlist.size()
+# ── CANCEL ───────────────────────────────────────────────
+def _handle_cancel(turn):
+    conf_match = _CONF_RE.search(turn.text.upper())
+    if conf_match:
+        conf = conf_match.group()
+        reservations = session.get("reservations", [])
+        session["reservations"] = [r for r in reservations if r.get("conf_num") != conf]
+        # Free the table
+        rest = CONF_INDEX.pop(conf, None)
+        if rest is not None:
+            res = rest.reservations.pop(conf)
+            if res.table_id in rest.tables:
+                rest.mark_available(res.table_id)
         return {
             "type": "text",
-            "message": f"I'll add you to the waitlist for **{restaurant_name}**.\n\nCurrent queue: **{current_wait} parties** ahead of you.\n\nWhat name should I put you under?",
-            "next_phase": "waitlist_name",
-            "booking": booking
-        }
+            "message": f"✅ Reservation **{conf}** has been cancelled. No charges apply within our cancellation window."
+        }, Phase.IDLE, {}
+    return {
+        "type": "text",
+        "message": "Please provide your confirmation number (e.g. TM-XXXXX) to cancel."
+    }, Phase.IDLE, turn.booking
 
-    if phase == "waitlist_name":
-        name = engine.extract_name(text)
-        if not name or len(name) < 2:
-            return {"type": "text", "message": "Could you share your name please?", "next_phase": "waitlist_name", "booking": booking}
-        booking["name"] = name
-        return {
-            "type": "chips",
-            "message": f"Got it, **{name}**! How many guests?",
-            "chips": ["1", "2", "3", "4", "5", "6"],
-            "next_phase": "waitlist_party",
-            "booking": booking
-        }
 
-    if phase == "waitlist_party":
-        party = engine.extract_party_size(text)
-        if not party:
-            return {"type": "chips", "message": "How many guests?", "chips": ["1","2","3","4","5","6"], "next_phase": "waitlist_party", "booking": booking}
-        entry = restaurant.waitlist.add(booking["name"], party)
+# ── BOOKING FLOW ─────────────────────────────────────────
+def _handle_booking_start(turn):
+    booking = turn.booking
+    # Try to pre-extract info from message
+    party = engine.extract_party_size(turn.text)
+    if party:
+        booking["party"] = party
+    return {
+        "type": "text",
+        "message": f"Let's get your table at **{turn.restaurant_name}**! 🎉\n\nWhat name should the reservation be under?"
+    }, Phase.BOOKING_NAME, booking
+
+
+def _handle_booking_name(turn):
+    booking = turn.booking
+    name = engine.extract_name(turn.text)
+    if not name or len(name) < 2:
+        return {"type": "text", "message": "What name should the reservation be under?"}, Phase.BOOKING_NAME, booking
+    booking["name"] = name
+    if "party" in booking:
+        # Skip party question
         return {
-            "type": "success",
-            "message": "Added to waitlist!",
-            "details": {
-                "Name": entry["name"],
-                "Party size": party,
-                "Position": f"#{restaurant.waitlist.size()} in queue",
-                "Est. wait": entry["estimated_wait"]
-            },
-            "sms": f"TableMate: You're #{restaurant.waitlist.size()} on the waitlist at {restaurant.name}. Est. wait: {entry['estimated_wait']}",
-            "next_phase": "idle",
-            "booking": {}
-        }
+            "type": "chips",
+            "message": f"Lovely, **{name}**! Which date works for you?",
+            "chips": get_date_options()
+        }, Phase.BOOKING_DATE, booking
+    return {
+        "type": "chips",
+        "message": f"Lovely, **{name}**! How many guests will be joining you?",
+        "chips": BOOKING_PARTY_CHIPS
+    }, Phase.BOOKING_PARTY, booking
 
-    # ── MY BOOKINGS ───────────────────────────────────────────
-    if intent == "my_bookings":
-        reservations = session.get("reservations", [])
-        if not reservations:
-            return {
-                "type": "text",
-                "message": "You don't have any reservations yet. Would you like to make one?",
-                "chips": ["Book a table for 2", "Book a table for 4"],
-                "next_phase": "idle",
-                "booking": {}
-            }
-        return {
-            "type": "reservations",
-            "message": f"Here are your **{len(reservations)}** reservation(s):",
-            "reservations": reservations,
-            "next_phase": "idle",
-            "booking": booking
-        }
 
-    # ── CANCEL ───────────────────────────────────────────────
-    if intent == "cancel" and "cancel" in text_lower:
-        conf_match = re.search(r"TM[A-Z0-9]+", text.upper())
-        if conf_match:
-            conf = conf_match.group()
-            reservations = session.get("reservations", [])
-            session["reservations"] = [r for r in reservations if r.get("conf_num") != conf]
-            # Free the table
-            for rest in RESTAURANTS.values():
-                if conf in rest.reservations:
-                    res = rest.reservations.pop(conf)
-                    if res.table_id in rest.tables:
-                        rest.tables[res.table_id]["status"] = "available"
-                        rest.tables[res.table_id]["reservation"] = None
-            return {
-                "type": "text",
-                "message": f"✅ Reservation **{conf}** has been cancelled. No charges apply within our cancellation window.",
-                "next_phase": "idle",
-                "booking": {}
-            }
+def _handle_booking_party(turn):
+    booking = turn.booking
+    party = engine.extract_party_size(turn.text)
+    if not party:
+        return {"type": "chips", "message": "How many guests will be joining you?", "chips": BOOKING_PARTY_CHIPS}, Phase.BOOKING_PARTY, booking
+    if party > 8:
         return {
             "type": "text",
-            "message": "Please provide your confirmation number (e.g. TM-XXXXX) to cancel.",
-            "next_phase": "idle",
-            "booking": booking
-        }
+            "message": "For parties larger than 8, please contact us directly for private dining arrangements. 🥂",
+            "chips": ["Book for 8", "Start over"]
+        }, Phase.IDLE, {}
+    booking["party"] = party
+    return {
+        "type": "chips",
+        "message": f"Perfect — **{party} guests**! Which date works best?",
+        "chips": get_date_options()
+    }, Phase.BOOKING_DATE, booking
 
-    # ── BOOKING FLOW ─────────────────────────────────────────
-    if (intent == "book" or phase.startswith("book")) and phase == "idle":
-        # Try to pre-extract info from message
-        party = engine.extract_party_size(text)
-        if party:
-            booking["party"] = party
-        return {
-            "type": "text",
-            "message": f"Let's get your table at **{restaurant_name}**! 🎉\n\nWhat name should the reservation be under?",
-            "next_phase": "booking_name",
-            "booking": booking
-        }
 
-    if phase == "booking_name" or (intent == "book" and phase == "idle"):
-        if phase != "booking_name":
-            return {
-                "type": "text",
-                "message": f"Let's book your table at **{restaurant_name}**! What name shall I put it under?",
-                "next_phase": "booking_name",
-                "booking": {}
-            }
-        name = engine.extract_name(text)
-        if not name or len(name) < 2:
-            return {"type": "text", "message": "What name should the reservation be under?", "next_phase": "booking_name", "booking": booking}
-        booking["name"] = name
-        if "party" in booking:
-            # Skip party question
-            return {
-                "type": "chips",
-                "message": f"Lovely, **{name}**! Which date works for you?",
-                "chips": get_date_options(),
-                "next_phase": "booking_date",
-                "booking": booking
-            }
-        return {
-            "type": "chips",
-            "message": f"Lovely, **{name}**! How many guests will be joining you?",
-            "chips": ["1", "2", "3", "4", "5", "6", "7", "8"],
-            "next_phase": "booking_party",
-            "booking": booking
-        }
+def _handle_booking_date(turn):
+    booking = turn.booking
+    booking["date"] = turn.text.strip().capitalize()
+    return {
+        "type": "chips",
+        "message": f"And what time would you prefer?",
+        "chips": TIME_SLOTS
+    }, Phase.BOOKING_TIME, booking
 
-    if phase == "booking_party":
-        party = engine.extract_party_size(text)
-        if not party:
-            return {"type": "chips", "message": "How many guests will be joining you?", "chips": ["1","2","3","4","5","6","7","8"], "next_phase": "booking_party", "booking": booking}
-        if party > 8:
-            return {
-                "type": "text",
-                "message": "For parties larger than 8, please contact us directly for private dining arrangements. 🥂",
-                "chips": ["Book for 8", "Start over"],
-                "next_phase": "idle",
-                "booking": {}
-            }
-        booking["party"] = party
-        return {
-            "type": "chips",
-            "message": f"Perfect — **{party} guests**! Which date works best?",
-            "chips": get_date_options(),
-            "next_phase": "booking_date",
-            "booking": booking
-        }
 
-    if phase == "booking_date":
-        booking["date"] = text.strip().capitalize()
+def _handle_booking_time(turn):
+    booking = turn.booking
+    time = engine.extract_time(turn.text) or turn.text.strip()
+    booking["time"] = time
+
+    # Check table availability
+    party = booking.get("party", 2)
+    candidates = turn.restaurant.get_available_tables(party, booking.get("date"), time)
+
+    if not candidates:
+        # Offer waitlist
         return {
             "type": "chips",
-            "message": f"And what time would you prefer?",
-            "chips": TIME_SLOTS,
-            "next_phase": "booking_time",
-            "booking": booking
+            "message": f"😔 No tables available for **{party} guests** at **{time}** on **{booking.get('date')}**.\n\nWould you like to join the waitlist or try a different time?",
+            "chips": ["Join waitlist", "Try 7:00 PM", "Try 8:00 PM"]
+        }, Phase.IDLE, booking
+
+    booking["table_id"] = candidates[0][1]  # Best fit table
+    return {
+        "type": "chips",
+        "message": "Any special requests or dietary requirements?",
+        "chips": ["No special requests", "Window seat 🪟", "Birthday 🎂", "Anniversary 💑", "I have dietary needs 🥗"]
+    }, Phase.BOOKING_SPECIAL, booking
+
+
+def _handle_booking_special(turn):
+    booking = turn.booking
+    booking["special"] = "None" if "no special" in turn.text_lower else turn.text.strip()
+    dietary = DietaryMatcher.detect(turn.text, lower=turn.text_lower)
+    booking["dietary"] = ", ".join(dietary) if dietary else ""
+    return {
+        "type": "confirm",
+        "message": "Please confirm your reservation:",
+        "details": {
+            "Restaurant": turn.restaurant_name,
+            "Name": booking.get("name"),
+            "Date": booking.get("date"),
+            "Time": booking.get("time"),
+            "Party": f"{booking.get('party')} guests",
+            "Special requests": booking.get("special", "None"),
+            "Dietary": booking.get("dietary") or "None"
         }
+    }, Phase.BOOKING_CONFIRM, booking
 
-    if phase == "booking_time":
-        time = engine.extract_time(text) or text.strip()
-        booking["time"] = time
-
-        # Check table availability
-        party = booking.get("party", 2)
-        candidates = restaurant.get_available_tables(party, booking.get("date"), time)
-
-        if not candidates:
-            # Offer waitlist
-            return {
-                "type": "chips",
-                "message": f"😔 No tables available for **{party} guests** at **{time}** on **{booking.get('date')}**.\n\nWould you like to join the waitlist or try a different time?",
-                "chips": ["Join waitlist", "Try 7:00 PM", "Try 8:00 PM"],
-                "next_phase": "idle",
-                "booking": booking
-            }
 
-        booking["table_id"] = candidates[0][1]  # Best fit table
+def _handle_booking_confirm(turn):
+    booking, words = turn.booking, turn.words
+    positive = not _POSITIVE.isdisjoint(words) or "go ahead" in turn.text_lower
+    negative = not _NEGATIVE.isdisjoint(words)
+
+    if positive:
+        return complete_booking(booking, turn.restaurant, turn.restaurant_name, session)
+    elif negative:
         return {
             "type": "chips",
-            "message": "Any special requests or dietary requirements?",
-            "chips": ["No special requests", "Window seat 🪟", "Birthday 🎂", "Anniversary 💑", "I have dietary needs 🥗"],
-            "next_phase": "booking_special",
-            "booking": booking
+            "message": "No problem — what would you like to change?",
+            "chips": ["Change date", "Change time", "Change party size", "Start over"]
+        }, Phase.IDLE, booking
+    return {
+        "type": "confirm",
+        "message": "Shall I confirm this reservation?",
+        "details": {
+            "Restaurant": turn.restaurant_name,
+            "Name": booking.get("name"),
+            "Date": booking.get("date"),
+            "Time": booking.get("time"),
+            "Party": f"{booking.get('party')} guests"
         }
+    }, Phase.BOOKING_CONFIRM, booking
 
-    if phase == "booking_special":
-        booking["special"] = "None" if "no special" in text_lower else text.strip()
-        dietary = DietaryMatcher.detect(text)
-        booking["dietary"] = ", ".join(dietary) if dietary else ""
-        return {
-            "type": "confirm",
-            "message": "Please confirm your reservation:",
-            "details": {
-                "Restaurant": restaurant_name,
-                "Name": booking.get("name"),
-                "Date": booking.get("date"),
-                "Time": booking.get("time"),
-                "Party": f"{booking.get('party')} guests",
-                "Special requests": booking.get("special", "None"),
-                "Dietary": booking.get("dietary") or "None"
-            },
-            "next_phase": "booking_confirm",
-            "booking": booking
-        }
 
-    if phase == "booking_confirm":
-        positive = any(w in text_lower for w in ["yes", "confirm", "book", "great", "perfect", "ok", "sure", "go ahead"])
-        negative = any(w in text_lower for w in ["no", "cancel", "wrong", "change"])
-
-        if positive:
-            return complete_booking(booking, restaurant, restaurant_name, session)
-        elif negative:
-            return {
-                "type": "chips",
-                "message": "No problem — what would you like to change?",
-                "chips": ["Change date", "Change time", "Change party size", "Start over"],
-                "next_phase": "idle",
-                "booking": booking
-            }
-        return {
-            "type": "confirm",
-            "message": "Shall I confirm this reservation?",
-            "details": {
-                "Restaurant": restaurant_name,
-                "Name": booking.get("name"),
-                "Date": booking.get("date"),
-                "Time": booking.get("time"),
-                "Party": f"{booking.get('party')} guests"
-            },
-            "next_phase": "booking_confirm",
-            "booking": booking
-        }
+# Default
+def _handle_default(turn):
+    return _default_payload(), Phase.IDLE, turn.booking
 
-    # Default
-    return {
+
+@lru_cache(maxsize=1)
+def _default_payload():
+    return app.json.encode({
         "type": "chips",
         "message": "I'd be happy to help! What would you like to do?",
-        "chips": ["📅 Book a table", "🍴 View menu", "⏳ Join waitlist", "📋 My reservations"],
-        "next_phase": "idle",
-        "booking": booking
-    }
+        "chips": ["📅 Book a table", "🍴 View menu", "⏳ Join waitlist", "📋 My reservations"]
+    })
+
+
+# (phase, intent) -> handler. A None phase matches any phase; a None intent is the
+# phase's own prompt, used when no intent rule applies.
+DISPATCH = {
+    **{(Phase.GREETING, intent): _handle_greeting for intent in Intent},
+    (None, Intent.HELLO): _handle_greeting,
+    (None, Intent.MENU): _handle_menu,
+    (None, Intent.DIETARY): _handle_dietary,
+    (None, Intent.HOURS): _handle_info,
+    (None, Intent.POLICY): _handle_info,
+    (Phase.IDLE, Intent.WAITLIST): _handle_waitlist_start,
+    (Phase.WAITLIST_NAME, None): _handle_waitlist_name,
+    (Phase.WAITLIST_PARTY, None): _handle_waitlist_party,
+    # Waitlist prompts outrank these two intents; booking prompts don't
+    (Phase.WAITLIST_NAME, Intent.MY_BOOKINGS): _handle_waitlist_name,
+    (Phase.WAITLIST_NAME, Intent.CANCEL): _handle_waitlist_name,
+    (Phase.WAITLIST_PARTY, Intent.MY_BOOKINGS): _handle_waitlist_party,
+    (Phase.WAITLIST_PARTY, Intent.CANCEL): _handle_waitlist_party,
+    (None, Intent.MY_BOOKINGS): _handle_my_bookings,
+    (None, Intent.CANCEL): _handle_cancel,
+    (Phase.IDLE, Intent.BOOK): _handle_booking_start,
+    (Phase.BOOKING_NAME, None): _handle_booking_name,
+    (Phase.BOOKING_PARTY, None): _handle_booking_party,
+    (Phase.BOOKING_DATE, None): _handle_booking_date,
+    (Phase.BOOKING_TIME, None): _handle_booking_time,
+    (Phase.BOOKING_SPECIAL, None): _handle_booking_special,
+    (Phase.BOOKING_CONFIRM, None): _handle_booking_confirm,
+}
+
+
+def _resolve_handler(phase, intent):
+    # Most specific rule first: (phase, intent), then any-phase intent, then the phase prompt
+    return (DISPATCH.get((phase, intent)) or DISPATCH.get((None, intent))
+            or DISPATCH.get((phase, None)) or _handle_default)
+
+
+# Every (phase, intent) pair resolved once, so routing a turn is a single lookup
+_HANDLERS = {(phase, intent): _resolve_handler(phase, intent) for phase in Phase for intent in Intent}
 
 
 def complete_booking(booking, restaurant, restaurant_name, session):
@@ -674,9 +1179,9 @@ def complete_booking(booking, restaurant, restaurant_name, session):
     )
     # Update table status
     if res.table_id in restaurant.tables:
-        restaurant.tables[res.table_id]["status"] = "reserved"
-        restaurant.tables[res.table_id]["reservation"] = res.conf_num
+        restaurant.mark_reserved(res.table_id, res.conf_num)
     restaurant.reservations[res.conf_num] = res
+    CONF_INDEX[res.conf_num] = restaurant
 
     # Store in session
     reservations = session.get("reservations", [])
@@ -695,28 +1200,50 @@ def complete_booking(booking, restaurant, restaurant_name, session):
             "Table": res.table_id,
             "Party": f"{res.party_size} guests",
         },
-        "sms": f"TableMate: Reservation confirmed! {res.conf_num} — {restaurant_name} on {res.date} at {res.time} for {res.party_size}. See you soon!",
-        "next_phase": "idle",
-        "booking": {}
-    }
+        "sms": f"TableMate: Reservation confirmed! {res.conf_num} — {restaurant_name} on {res.date} at {res.time} for {res.party_size}. See you soon!"
+    }, Phase.IDLE, {}
 
 
 def get_date_options():
-    today = datetime.now()
+    return list(_date_options_for(datetime.now().date()))
+
+
+@lru_cache(maxsize=2)
+def _date_options_for(today):
+    """Date chips only change at midnight, so build them once per day."""
     options = ["Tonight"]
     for i in range(1, 6):
         d = today + timedelta(days=i)
         options.append(d.strftime("%a, %b %d"))
-    return options
+    return tuple(options)
 
 
 # ============================================================
 # API ENDPOINTS
 # ============================================================
 
+def _conditional(payload):
+    """JSON response for a cached (body, etag) pair; 304 when the client's copy matches."""
+    body, etag = payload
+    response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
+def _with_etag(obj):
+    body = app.json.encode(obj)
+    return body, hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
 @app.route("/api/restaurants", methods=["GET"])
 def get_restaurants():
-    return jsonify([r.to_dict() for r in RESTAURANTS.values()])
+    return _conditional(_restaurants_payload(tuple(r.version for r in RESTAURANTS.values())))
+
+
+@lru_cache(maxsize=16)
+def _restaurants_payload(versions):
+    """Serialized restaurant list, keyed on every restaurant's table version."""
+    return _with_etag([r.to_dict() for r in RESTAURANTS.values()])
 
 
 @app.route("/api/tables/<restaurant_name>", methods=["GET"])
@@ -724,7 +1251,13 @@ def get_tables(restaurant_name):
     restaurant = RESTAURANTS.get(restaurant_name)
     if not restaurant:
         return jsonify({"error": "Restaurant not found"}), 404
-    return jsonify(list(restaurant.tables.values()))
+    return _conditional(_tables_payload(restaurant_name, restaurant.version))
+
+
+@lru_cache(maxsize=64)
+def _tables_payload(restaurant_name, version):
+    """Serialized table list; a booking or cancellation bumps the version and misses."""
+    return _with_etag([table.to_dict() for table in RESTAURANTS[restaurant_name].tables.values()])
 
 
 @app.route("/api/waitlist/<restaurant_name>", methods=["GET"])
@@ -740,7 +1273,7 @@ def get_stats():
     stats = {}
     for name, rest in RESTAURANTS.items():
         total = len(rest.tables)
-        reserved = sum(1 for t in rest.tables.values() if t["status"] == "reserved")
+        reserved = rest.reserved_count
         stats[name] = {
             "total_tables": total,
             "reserved": reserved,
@@ -755,10 +1288,17 @@ def get_stats():
 @app.route("/api/menu/<restaurant_name>", methods=["GET"])
 def get_menu(restaurant_name):
     dietary = request.args.get("dietary", "").split(",") if request.args.get("dietary") else []
-    menu = MENU_DATA.get(restaurant_name, [])
-    if dietary and dietary != [""]:
-        menu = DietaryMatcher.filter_menu(menu, dietary)
-    return jsonify(menu)
+    restrictions = frozenset(dietary)
+    if restaurant_name in MENU_DATA and restrictions <= _REQUIRED_TAGS.keys():
+        return _conditional(_menu_payload(restaurant_name, restrictions))
+    # Names and restrictions come from the URL; only known ones become cache keys
+    return _conditional(_menu_payload.__wrapped__(restaurant_name, restrictions))
+
+
+@lru_cache(maxsize=256)
+def _menu_payload(restaurant_name, restrictions):
+    """Serialized menu and its ETag. Menus are static, so entries never go stale."""
+    return _with_etag(DietaryMatcher.menu_for(restaurant_name, restrictions))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+"""Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+Sessions, tables and waitlists live in process memory, so the app must run in a
+single worker process; extra workers would each hold their own copy. Concurrency
+comes from threads instead, which the shared state is locked for.
+"""
+import os
+
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))